@@ -3,54 +3,16 @@ import cv2
 import mediapipe as mp
 import numpy as np
 
+from pose_config import LazyCanvas, landmarks_to_array, draw_pose, to_rgb
+
 VIDEO_PATH = "./video2.mp4"
 USE_INTERACTIVE_PICKER = True  # Set to False to use FRAME_INDEX directly
 FRAME_INDEX = 895  # Default frame (used if USE_INTERACTIVE_PICKER is False)
+MODEL_COMPLEXITY = 1  # Picker's starting Pose model (press 'c' to toggle 1/2)
 
 mp_pose = mp.solutions.pose
 mp_drawing = mp.solutions.drawing_utils
 
-# Simplified skeleton: only key joints (nose, shoulders, elbows, wrists, hips, knees, ankles)
-SIMPLE_CONNECTIONS = [
-    # Head to shoulders
-    (mp_pose.PoseLandmark.NOSE, mp_pose.PoseLandmark.LEFT_SHOULDER),
-    (mp_pose.PoseLandmark.NOSE, mp_pose.PoseLandmark.RIGHT_SHOULDER),
-    # Torso
-    (mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.RIGHT_SHOULDER),
-    (mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_HIP),
-    (mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_HIP),
-    (mp_pose.PoseLandmark.LEFT_HIP, mp_pose.PoseLandmark.RIGHT_HIP),
-    # Left arm
-    (mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_ELBOW),
-    (mp_pose.PoseLandmark.LEFT_ELBOW, mp_pose.PoseLandmark.LEFT_WRIST),
-    # Right arm
-    (mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_ELBOW),
-    (mp_pose.PoseLandmark.RIGHT_ELBOW, mp_pose.PoseLandmark.RIGHT_WRIST),
-    # Left leg
-    (mp_pose.PoseLandmark.LEFT_HIP, mp_pose.PoseLandmark.LEFT_KNEE),
-    (mp_pose.PoseLandmark.LEFT_KNEE, mp_pose.PoseLandmark.LEFT_ANKLE),
-    # Right leg
-    (mp_pose.PoseLandmark.RIGHT_HIP, mp_pose.PoseLandmark.RIGHT_KNEE),
-    (mp_pose.PoseLandmark.RIGHT_KNEE, mp_pose.PoseLandmark.RIGHT_ANKLE),
-]
-
-# Key landmarks to draw (only main joints)
-KEY_LANDMARKS = [
-    mp_pose.PoseLandmark.NOSE,
-    mp_pose.PoseLandmark.LEFT_SHOULDER,
-    mp_pose.PoseLandmark.RIGHT_SHOULDER,
-    mp_pose.PoseLandmark.LEFT_ELBOW,
-    mp_pose.PoseLandmark.RIGHT_ELBOW,
-    mp_pose.PoseLandmark.LEFT_WRIST,
-    mp_pose.PoseLandmark.RIGHT_WRIST,
-    mp_pose.PoseLandmark.LEFT_HIP,
-    mp_pose.PoseLandmark.RIGHT_HIP,
-    mp_pose.PoseLandmark.LEFT_KNEE,
-    mp_pose.PoseLandmark.RIGHT_KNEE,
-    mp_pose.PoseLandmark.LEFT_ANKLE,
-    mp_pose.PoseLandmark.RIGHT_ANKLE,
-]
-
 def read_frame(path, frame_idx):
     cap = cv2.VideoCapture(path)
     if not cap.isOpened():
@@ -64,37 +26,75 @@ def read_frame(path, frame_idx):
 
 def analyze_and_annotate_frame(frame, pose):
     """Analyze a frame and return annotated version with pose overlay."""
-    image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    image_rgb = to_rgb(frame)
     result = pose.process(image_rgb)
     
-    annotated = frame.copy()
-    h, w, _ = frame.shape
+    canvas = LazyCanvas(frame)
     
     if result.pose_landmarks:
-        # Draw only the simplified connections
-        for connection in SIMPLE_CONNECTIONS:
-            start_idx = connection[0].value
-            end_idx = connection[1].value
-            start_point = result.pose_landmarks.landmark[start_idx]
-            end_point = result.pose_landmarks.landmark[end_idx]
-            
-            # Only draw if both landmarks are visible
-            if start_point.visibility > 0.5 and end_point.visibility > 0.5:
-                start = (int(start_point.x * w), int(start_point.y * h))
-                end = (int(end_point.x * w), int(end_point.y * h))
-                cv2.line(annotated, start, end, (0, 0, 255), 2)
-        
-        # Draw only key landmarks
-        for landmark_idx in KEY_LANDMARKS:
-            lm = result.pose_landmarks.landmark[landmark_idx.value]
-            if lm.visibility > 0.5:
-                x = int(lm.x * w)
-                y = int(lm.y * h)
-                cv2.circle(annotated, (x, y), 3, (0, 255, 0), -1)
-        
-        return annotated, True
+        draw_pose(canvas, landmarks_to_array(result.pose_landmarks))
+        return canvas.arr, True
     else:
-        return annotated, False
+        return canvas.arr, False
+
+PICKER_WINDOW = "Video Frame Picker - Press 'a' to analyze, 'q' to quit"
+HUD_HEIGHT = 120  # Rows at the top of the picker covered by the info text
+HUD_CONTROLS = "Controls: [Space]Play [,/.]Nav [-]/[=]Jump10 [a]Analyze [t]Toggle [c]Model [q]Quit"
+_hud_templates = {}
+
+def _hud_template(w, show_overlay):
+    """Return (template, mask) with the static HUD lines pre-rendered for width w.
+
+    Glyph rasterization is slow, so the overlay status and controls lines are
+    drawn once and stamped onto each frame through the mask of text pixels.
+    """
+    key = (w, show_overlay)
+    if key not in _hud_templates:
+        template = np.zeros((HUD_HEIGHT, w, 3), dtype=np.uint8)
+        static_text = [
+            (2, f"Pose Overlay: {'ON' if show_overlay else 'OFF'}"),
+            (3, HUD_CONTROLS),
+        ]
+        for i, text in static_text:
+            cv2.putText(template, text, (10, 30 + i * 25),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        # uint8 mask so cv2.copyTo can stamp it; boolean fancy indexing is ~100x slower
+        _hud_templates[key] = (template, template.any(axis=2).astype(np.uint8))
+    return _hud_templates[key]
+
+def _render_hud(display, current_frame, total_frames, fps, show_overlay):
+    """Draw the info text and frame indicator bar onto display in place."""
+    h, w = display.shape[:2]
+    template, mask = _hud_template(w, show_overlay)
+    rows = min(HUD_HEIGHT, h)
+    cv2.copyTo(template[:rows], mask[:rows], display[:rows])
+    
+    info_text = [
+        f"Frame: {current_frame}/{total_frames}",
+        f"Time: {current_frame/fps:.2f}s",
+    ]
+    y_offset = 30
+    for i, text in enumerate(info_text):
+        cv2.putText(display, text, (10, y_offset + i * 25),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    
+    # Draw frame indicator bar
+    bar_width = int((current_frame / total_frames) * w)
+    cv2.rectangle(display, (0, h-10), (bar_width, h), (0, 255, 0), -1)
+    cv2.rectangle(display, (0, h-10), (w, h), (255, 255, 255), 2)
+
+def _new_picker_pose(complexity):
+    """Create the picker's Pose in video mode so consecutive frames use the tracker."""
+    return mp_pose.Pose(static_image_mode=False, model_complexity=complexity,
+                        min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+def _reset_tracking(pose, complexity):
+    """Drop tracking state so the next frame runs the detector."""
+    if hasattr(pose, 'reset'):
+        pose.reset()
+        return pose
+    pose.close()
+    return _new_picker_pose(complexity)
 
 def pick_frame_interactive(video_path):
     """Interactive video player to pick a frame for analysis.
@@ -106,7 +106,11 @@ def pick_frame_interactive(video_path):
     - 'g': Go to specific frame number
     - 'a': Analyze current frame (save image and show overlay)
     - 't': Toggle pose overlay on/off
+    - 'c': Toggle pose model complexity between 1 (fast) and 2 (accurate)
     - 'q' or ESC: Quit and return frame number
+    
+    Returns (frame_index, frame) where frame is the already-decoded BGR image
+    for that index, or None if it could not be read.
     """
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
@@ -116,13 +120,24 @@ def pick_frame_interactive(video_path):
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     fps = cap.get(cv2.CAP_PROP_FPS)
     
-    # Initialize pose detection
-    pose = mp_pose.Pose(static_image_mode=True, model_complexity=2)
+    # Initialize pose detection (one instance for the whole session)
+    complexity = MODEL_COMPLEXITY
+    pose = _new_picker_pose(complexity)
     
     current_frame = 0
     playing = False
     show_overlay = False
     selected_frame = None
+    analyzed = None  # (frame_index, annotated_frame) left by 'a' for the next redraw
+    last_pose_frame = None  # Last frame the Pose processed; None while it has no state
+    
+    def analyze_current():
+        """Run the Pose on the current frame, dropping tracking unless it follows on."""
+        nonlocal pose, last_pose_frame
+        if last_pose_frame is not None and current_frame != last_pose_frame + 1:
+            pose = _reset_tracking(pose, complexity)
+        last_pose_frame = current_frame
+        return analyze_and_annotate_frame(frame, pose)
     
     print(f"\n=== Video Frame Picker ===")
     print(f"Total frames: {total_frames}")
@@ -134,46 +149,35 @@ def pick_frame_interactive(video_path):
     print(f"  'g': Go to specific frame number")
     print(f"  'a': Analyze & save current frame (toggles overlay)")
     print(f"  't': Toggle pose overlay on/off")
+    print(f"  'c': Toggle model complexity (1 fast / 2 accurate)")
     print(f"  'q' or ESC: Quit and return frame number")
     print(f"========================\n")
     
     while True:
-        cap.set(cv2.CAP_PROP_POS_FRAMES, current_frame)
-        ret, frame = cap.read()
-        
-        if not ret:
-            break
+        # After 'a' the frame is already decoded and processed; reuse both
+        reuse = analyzed is not None and analyzed[0] == current_frame
+        if not reuse:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, current_frame)
+            ret, frame = cap.read()
+            
+            if not ret:
+                break
         
         # Apply pose overlay if enabled
         if show_overlay:
-            annotated_frame, has_pose = analyze_and_annotate_frame(frame, pose)
+            if reuse:
+                annotated_frame = analyzed[1]
+            else:
+                annotated_frame, has_pose = analyze_current()
             display = annotated_frame
-            if not has_pose:
-                display = frame.copy()  # Fallback if no pose detected
+            if annotated_frame is frame:
+                display = frame.copy()  # Nothing drawn; keep the decoded frame clean
         else:
             display = frame.copy()
+        analyzed = None
         
-        h, w = display.shape[:2]
-        
-        # Draw info text
-        overlay_status = "ON" if show_overlay else "OFF"
-        info_text = [
-            f"Frame: {current_frame}/{total_frames}",
-            f"Time: {current_frame/fps:.2f}s",
-            f"Pose Overlay: {overlay_status}",
-            "Controls: [Space]Play [,/.]Nav [-]/[=]Jump10 [a]Analyze [t]Toggle [q]Quit"
-        ]
-        y_offset = 30
-        for i, text in enumerate(info_text):
-            cv2.putText(display, text, (10, y_offset + i * 25),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-        
-        # Draw frame indicator bar
-        bar_width = int((current_frame / total_frames) * w)
-        cv2.rectangle(display, (0, h-10), (bar_width, h), (0, 255, 0), -1)
-        cv2.rectangle(display, (0, h-10), (w, h), (255, 255, 255), 2)
-        
-        cv2.imshow("Video Frame Picker - Press 'a' to analyze, 'q' to quit", display)
+        _render_hud(display, current_frame, total_frames, fps, show_overlay)
+        cv2.imshow(PICKER_WINDOW, display)
         
         # Handle keyboard input
         key = cv2.waitKey(30 if playing else 0) & 0xFF
@@ -184,37 +188,26 @@ def pick_frame_interactive(video_path):
         elif key == ord(' ') or key == 13:  # Space or Enter
             playing = not playing
         elif key == ord('a'):  # Analyze and save
-            annotated_frame, has_pose = analyze_and_annotate_frame(frame, pose)
+            annotated_frame, has_pose = analyze_current()
             if has_pose:
                 # Save annotated frame
                 output_filename = f"frame_{current_frame:05d}.jpg"
                 cv2.imwrite(output_filename, annotated_frame)
                 print(f"Analyzed and saved frame {current_frame} to {output_filename}")
-                # Toggle overlay on and update display immediately
+                # Turn the overlay on; the next loop iteration redraws with it
                 show_overlay = True
-                display = annotated_frame
-                # Redraw display with overlay
-                h, w = display.shape[:2]
-                overlay_status = "ON"
-                info_text = [
-                    f"Frame: {current_frame}/{total_frames}",
-                    f"Time: {current_frame/fps:.2f}s",
-                    f"Pose Overlay: {overlay_status}",
-                    "Controls: [Space]Play [,/.]Nav [-]/[=]Jump10 [a]Analyze [t]Toggle [q]Quit"
-                ]
-                y_offset = 30
-                for i, text in enumerate(info_text):
-                    cv2.putText(display, text, (10, y_offset + i * 25),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-                bar_width = int((current_frame / total_frames) * w)
-                cv2.rectangle(display, (0, h-10), (bar_width, h), (0, 255, 0), -1)
-                cv2.rectangle(display, (0, h-10), (w, h), (255, 255, 255), 2)
-                cv2.imshow("Video Frame Picker - Press 'a' to analyze, 'q' to quit", display)
+                analyzed = (current_frame, annotated_frame)
             else:
                 print(f"No pose detected in frame {current_frame}")
         elif key == ord('t'):  # Toggle overlay
             show_overlay = not show_overlay
             print(f"Pose overlay: {'ON' if show_overlay else 'OFF'}")
+        elif key == ord('c'):  # Toggle model complexity
+            complexity = 2 if complexity == 1 else 1
+            pose.close()
+            pose = _new_picker_pose(complexity)
+            last_pose_frame = None
+            print(f"Model complexity: {complexity}")
         elif key == ord('[') or key == ord(','):  # Alternative: [ or , for previous
             current_frame = max(0, current_frame - 1)
             playing = False
@@ -252,23 +245,28 @@ def pick_frame_interactive(video_path):
     pose.close()
     cv2.destroyAllWindows()
     
+    # frame is still the clean decoded image for the current index (or None
+    # if the last read failed); HUD and overlay are drawn on copies
     if selected_frame is not None:
         print(f"\nSelected frame: {selected_frame}")
-        return selected_frame
+        return selected_frame, frame
     else:
-        return current_frame
+        return current_frame, frame
 
 def main():
     # Let user pick frame interactively or use predefined
+    frame = None
     if USE_INTERACTIVE_PICKER:
-        selected_frame = pick_frame_interactive(VIDEO_PATH)
-        frame_index = selected_frame
+        frame_index, frame = pick_frame_interactive(VIDEO_PATH)
     else:
         frame_index = FRAME_INDEX
         print(f"Using predefined frame: {frame_index}")
     
-    frame = read_frame(VIDEO_PATH, frame_index)
-    image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    # The picker hands back the frame it already decoded; only reopen the
+    # video when there isn't one
+    if frame is None:
+        frame = read_frame(VIDEO_PATH, frame_index)
+    image_rgb = to_rgb(frame)
 
     with mp_pose.Pose(static_image_mode=True, model_complexity=2) as pose:
         result = pose.process(image_rgb)
@@ -277,38 +275,16 @@ def main():
         print("No athlete detected.")
         return
 
-    annotated = frame.copy()
+    canvas = LazyCanvas(frame)
     h, w, _ = frame.shape
-    
-    # Draw only the simplified connections
-    for connection in SIMPLE_CONNECTIONS:
-        start_idx = connection[0].value
-        end_idx = connection[1].value
-        start_point = result.pose_landmarks.landmark[start_idx]
-        end_point = result.pose_landmarks.landmark[end_idx]
-        
-        # Only draw if both landmarks are visible
-        if start_point.visibility > 0.5 and end_point.visibility > 0.5:
-            start = (int(start_point.x * w), int(start_point.y * h))
-            end = (int(end_point.x * w), int(end_point.y * h))
-            cv2.line(annotated, start, end, (0, 0, 255), 2)
-    
-    # Draw only key landmarks
-    for landmark_idx in KEY_LANDMARKS:
-        lm = result.pose_landmarks.landmark[landmark_idx.value]
-        if lm.visibility > 0.5:
-            x = int(lm.x * w)
-            y = int(lm.y * h)
-            cv2.circle(annotated, (x, y), 3, (0, 255, 0), -1)
+    arr = landmarks_to_array(result.pose_landmarks)
+    draw_pose(canvas, arr)
 
-    keypoints = []
-    for lm in result.pose_landmarks.landmark:
-        keypoints.append((lm.x * w, lm.y * h, lm.visibility))
-    keypoints = np.array(keypoints)
+    keypoints = arr[:, [0, 1, 3]] * (w, h, 1)
 
     print(keypoints)
 
-    cv2.imshow("MediaPipe Pose", annotated)
+    cv2.imshow("MediaPipe Pose", canvas.arr)
     cv2.waitKey(0)
     cv2.destroyAllWindows()
 
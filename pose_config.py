@@ -0,0 +1,144 @@
+"""
+Skeleton definition and drawing helpers shared by main.py and web_app_backend.py.
+"""
+
+import threading
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to plain Python loops
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+mp_pose = mp.solutions.pose
+
+# Simplified skeleton: only key joints (nose, shoulders, elbows, wrists, hips, knees, ankles)
+SIMPLE_CONNECTIONS = [
+    # Head to shoulders
+    (mp_pose.PoseLandmark.NOSE, mp_pose.PoseLandmark.LEFT_SHOULDER),
+    (mp_pose.PoseLandmark.NOSE, mp_pose.PoseLandmark.RIGHT_SHOULDER),
+    # Torso
+    (mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.RIGHT_SHOULDER),
+    (mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_HIP),
+    (mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_HIP),
+    (mp_pose.PoseLandmark.LEFT_HIP, mp_pose.PoseLandmark.RIGHT_HIP),
+    # Left arm
+    (mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_ELBOW),
+    (mp_pose.PoseLandmark.LEFT_ELBOW, mp_pose.PoseLandmark.LEFT_WRIST),
+    # Right arm
+    (mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_ELBOW),
+    (mp_pose.PoseLandmark.RIGHT_ELBOW, mp_pose.PoseLandmark.RIGHT_WRIST),
+    # Left leg
+    (mp_pose.PoseLandmark.LEFT_HIP, mp_pose.PoseLandmark.LEFT_KNEE),
+    (mp_pose.PoseLandmark.LEFT_KNEE, mp_pose.PoseLandmark.LEFT_ANKLE),
+    # Right leg
+    (mp_pose.PoseLandmark.RIGHT_HIP, mp_pose.PoseLandmark.RIGHT_KNEE),
+    (mp_pose.PoseLandmark.RIGHT_KNEE, mp_pose.PoseLandmark.RIGHT_ANKLE),
+]
+
+# Key landmarks to draw (only main joints)
+KEY_LANDMARKS = [
+    mp_pose.PoseLandmark.NOSE,
+    mp_pose.PoseLandmark.LEFT_SHOULDER,
+    mp_pose.PoseLandmark.RIGHT_SHOULDER,
+    mp_pose.PoseLandmark.LEFT_ELBOW,
+    mp_pose.PoseLandmark.RIGHT_ELBOW,
+    mp_pose.PoseLandmark.LEFT_WRIST,
+    mp_pose.PoseLandmark.RIGHT_WRIST,
+    mp_pose.PoseLandmark.LEFT_HIP,
+    mp_pose.PoseLandmark.RIGHT_HIP,
+    mp_pose.PoseLandmark.LEFT_KNEE,
+    mp_pose.PoseLandmark.RIGHT_KNEE,
+    mp_pose.PoseLandmark.LEFT_ANKLE,
+    mp_pose.PoseLandmark.RIGHT_ANKLE,
+]
+
+# Landmark indices as contiguous int arrays so drawing never touches the enums
+CONN_IDX = np.fromiter(
+    (v for a, b in SIMPLE_CONNECTIONS for v in (a.value, b.value)), dtype=np.int32
+).reshape(-1, 2)
+KEY_IDX = np.fromiter((l.value for l in KEY_LANDMARKS), dtype=np.int32)
+
+
+class LazyCanvas:
+    """Wraps a frame and only copies it once something is drawn on it."""
+
+    def __init__(self, frame):
+        self.arr = frame
+        self.copied = False
+
+    def ensure_writable(self):
+        if not self.copied:
+            self.arr = self.arr.copy()
+            self.copied = True
+        return self
+
+
+def landmarks_to_array(pose_landmarks):
+    """Return pose landmarks as a (33, 4) float32 array of x, y, z, visibility."""
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark],
+                    dtype=np.float32)
+
+
+@njit(cache=True)
+def _build_draw_lists(arr, w, h, conn_idx, key_idx):
+    """Return pixel endpoints of visible edges (N, 2, 2) and visible joints (M, 2)."""
+    lines = np.empty((conn_idx.shape[0], 2, 2), dtype=np.int32)
+    n_lines = 0
+    for i in range(conn_idx.shape[0]):
+        a = conn_idx[i, 0]
+        b = conn_idx[i, 1]
+        if arr[a, 3] > 0.5 and arr[b, 3] > 0.5:
+            lines[n_lines, 0, 0] = int(arr[a, 0] * w)
+            lines[n_lines, 0, 1] = int(arr[a, 1] * h)
+            lines[n_lines, 1, 0] = int(arr[b, 0] * w)
+            lines[n_lines, 1, 1] = int(arr[b, 1] * h)
+            n_lines += 1
+
+    circles = np.empty((key_idx.shape[0], 2), dtype=np.int32)
+    n_circles = 0
+    for i in range(key_idx.shape[0]):
+        k = key_idx[i]
+        if arr[k, 3] > 0.5:
+            circles[n_circles, 0] = int(arr[k, 0] * w)
+            circles[n_circles, 1] = int(arr[k, 1] * h)
+            n_circles += 1
+
+    return lines[:n_lines], circles[:n_circles]
+
+
+def draw_pose(canvas, arr):
+    """Draw the simplified skeleton from a landmark array onto a LazyCanvas."""
+    h, w = canvas.arr.shape[:2]
+    lines, circles = _build_draw_lists(arr, w, h, CONN_IDX, KEY_IDX)
+    # Every edge endpoint is a key landmark, so no visible joints means
+    # nothing to draw
+    if len(circles) == 0:
+        return
+
+    image = canvas.ensure_writable().arr
+    # Only draw connections where both landmarks are visible, all in one call
+    if len(lines):
+        cv2.polylines(image, list(lines), False, (0, 0, 255), 2)
+
+    # Draw only visible key landmarks
+    for x, y in circles.tolist():
+        cv2.circle(image, (x, y), 3, (0, 255, 0), -1)
+
+
+# Per-thread RGB scratch buffer so cvtColor doesn't allocate every frame
+_rgb_local = threading.local()
+
+
+def to_rgb(frame):
+    """Convert a BGR frame to RGB into this thread's reusable buffer."""
+    buf = getattr(_rgb_local, 'buf', None)
+    if buf is None or buf.shape != frame.shape:
+        buf = np.empty_like(frame)
+        _rgb_local.buf = buf
+    # Pose.process copies the pixels into its own packet, so reuse is safe
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=buf)
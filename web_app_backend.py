@@ -10,106 +10,400 @@ import mediapipe as mp
 import numpy as np
 import os
 import tempfile
-import base64
+import io
+import hashlib
+import threading
+import atexit
+import queue
+import functools
+from collections import OrderedDict
 from werkzeug.utils import secure_filename
 
+from pose_config import LazyCanvas, landmarks_to_array, draw_pose, to_rgb
+
 app = Flask(__name__, static_folder='.')
 
 # Configure CORS - allow all origins since we're serving frontend from same domain
-CORS(app)
+CORS(app, expose_headers=['X-Annotated-Image-Url'])
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv'}
 MAX_FILE_SIZE = 500 * 1024 * 1024  # 500MB
+CAP_CACHE_SIZE = 4  # Number of open VideoCapture handles kept around
+MAX_GRAB_GAP = 30  # Grab window in frames when the video reports no FPS
+PIPELINE_QUEUE_SIZE = 4  # Frames buffered between batch pipeline stages
+# Absolute, since send_from_directory resolves relative paths against the app root
+ANNOTATED_FOLDER = os.path.abspath(os.path.join(UPLOAD_FOLDER, 'annotated'))
+IMAGE_CACHE_SIZE = 256  # Annotated images kept on disk, shared by all workers
+POSE_INPUT_MAX_SIDE = 512  # Frames are shrunk to this long edge before pose detection
+DEFAULT_MODEL_COMPLEXITY = 1  # Pose model used unless a request asks for 0 or 2
+ANALYZE_CACHE_SIZE = 256  # Single-frame analysis results memoized per worker
+KEYPOINT_FIELDS = ('x', 'y', 'z', 'visibility')
+
+# Output encoders selectable with ?fmt=; quality 80 is plenty for the picker
+# and much cheaper to encode than OpenCV's default of 95
+IMAGE_FORMATS = {
+    'jpg': ('.jpg', 'image/jpeg',
+            [int(cv2.IMWRITE_JPEG_QUALITY), 80, int(cv2.IMWRITE_JPEG_OPTIMIZE), 0]),
+    'webp': ('.webp', 'image/webp', [int(cv2.IMWRITE_WEBP_QUALITY), 80]),
+}
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(ANNOTATED_FOLDER, exist_ok=True)
 
 # MediaPipe setup (same as your main.py)
 mp_pose = mp.solutions.pose
 
-# Simplified skeleton connections (from main.py)
-SIMPLE_CONNECTIONS = [
-    (mp_pose.PoseLandmark.NOSE, mp_pose.PoseLandmark.LEFT_SHOULDER),
-    (mp_pose.PoseLandmark.NOSE, mp_pose.PoseLandmark.RIGHT_SHOULDER),
-    (mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.RIGHT_SHOULDER),
-    (mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_HIP),
-    (mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_HIP),
-    (mp_pose.PoseLandmark.LEFT_HIP, mp_pose.PoseLandmark.RIGHT_HIP),
-    (mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_ELBOW),
-    (mp_pose.PoseLandmark.LEFT_ELBOW, mp_pose.PoseLandmark.LEFT_WRIST),
-    (mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_ELBOW),
-    (mp_pose.PoseLandmark.RIGHT_ELBOW, mp_pose.PoseLandmark.RIGHT_WRIST),
-    (mp_pose.PoseLandmark.LEFT_HIP, mp_pose.PoseLandmark.LEFT_KNEE),
-    (mp_pose.PoseLandmark.LEFT_KNEE, mp_pose.PoseLandmark.LEFT_ANKLE),
-    (mp_pose.PoseLandmark.RIGHT_HIP, mp_pose.PoseLandmark.RIGHT_KNEE),
-    (mp_pose.PoseLandmark.RIGHT_KNEE, mp_pose.PoseLandmark.RIGHT_ANKLE),
-]
-
-KEY_LANDMARKS = [
-    mp_pose.PoseLandmark.NOSE,
-    mp_pose.PoseLandmark.LEFT_SHOULDER,
-    mp_pose.PoseLandmark.RIGHT_SHOULDER,
-    mp_pose.PoseLandmark.LEFT_ELBOW,
-    mp_pose.PoseLandmark.RIGHT_ELBOW,
-    mp_pose.PoseLandmark.LEFT_WRIST,
-    mp_pose.PoseLandmark.RIGHT_WRIST,
-    mp_pose.PoseLandmark.LEFT_HIP,
-    mp_pose.PoseLandmark.RIGHT_HIP,
-    mp_pose.PoseLandmark.LEFT_KNEE,
-    mp_pose.PoseLandmark.RIGHT_KNEE,
-    mp_pose.PoseLandmark.LEFT_ANKLE,
-    mp_pose.PoseLandmark.RIGHT_ANKLE,
-]
-
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def analyze_frame(frame, pose):
-    """Analyze a frame and return annotated version with pose overlay."""
-    image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    result = pose.process(image_rgb)
+def open_capture(filepath):
+    """Open a video, asking FFmpeg for hardware-accelerated decode when available."""
+    if hasattr(cv2, 'CAP_PROP_HW_ACCELERATION'):  # OpenCV >= 4.5.2
+        # No CAP_PROP_HW_DEVICE: OpenCV refuses a device index together with 'ANY'
+        cap = cv2.VideoCapture(filepath, cv2.CAP_FFMPEG, [
+            cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+        ])
+        if cap.isOpened():
+            return cap
+        cap.release()
+    # Fall back to the default (software) decoder
+    return cv2.VideoCapture(filepath)
+
+
+class CachedCapture:
+    """An open VideoCapture plus the index of the last frame it decoded."""
+
+    def __init__(self, filepath, mtime):
+        self.cap = open_capture(filepath)
+        self.mtime = mtime
+        self.last_frame_index = -1
+        self.lock = threading.Lock()
+        self.released = False  # Set under lock once evicted; callers must re-fetch
+        # Skipping up to ~2s of frames with grab() is cheaper than a keyframe seek
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.max_grab_gap = int(fps * 2) if fps > 0 else MAX_GRAB_GAP
+
+    def read(self, frame_index):
+        """Read a frame, stepping forward with grab() instead of seeking when close."""
+        gap = frame_index - (self.last_frame_index + 1)
+        if self.last_frame_index < 0 or not 0 <= gap <= self.max_grab_gap:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        else:
+            for _ in range(gap):
+                self.cap.grab()
+        ret, frame = self.cap.read()
+        self.last_frame_index = frame_index if ret else -1
+        return ret, frame
+
+    def release(self):
+        with self.lock:
+            self.cap.release()
+            self.released = True
+
+
+# Open VideoCapture handles, most recently used last
+_cap_cache = OrderedDict()
+_cap_cache_lock = threading.Lock()
+
+
+def get_cap(filepath):
+    """Return a cached capture for filepath, reopening it if the file changed."""
+    mtime = os.path.getmtime(filepath)
+    stale = []
+    with _cap_cache_lock:
+        entry = _cap_cache.get(filepath)
+        if entry is not None and entry.mtime == mtime:
+            _cap_cache.move_to_end(filepath)
+            return entry
+    
+    # Opening the container (and any hardware decoder) is slow, and releasing
+    # waits for the entry's reader, so neither happens under the cache lock
+    opened = CachedCapture(filepath, mtime)
+    with _cap_cache_lock:
+        entry = _cap_cache.get(filepath)
+        if entry is not None and entry.mtime == mtime:
+            # Another request opened it meanwhile; keep theirs
+            _cap_cache.move_to_end(filepath)
+            stale.append(opened)
+        else:
+            if entry is not None:
+                stale.append(_cap_cache.pop(filepath))
+            entry = _cap_cache[filepath] = opened
+            while len(_cap_cache) > CAP_CACHE_SIZE:
+                stale.append(_cap_cache.popitem(last=False)[1])
     
-    annotated = frame.copy()
+    for evicted in stale:
+        evicted.release()
+    return entry
+
+
+def read_video_frame(filepath, frame_index):
+    """Read a single frame through the capture cache."""
+    while True:
+        entry = get_cap(filepath)
+        with entry.lock:
+            # Another request may have evicted the entry before we got the lock
+            if not entry.released:
+                return entry.read(frame_index)
+
+
+# One Pose graph per worker thread, model complexity and mode; building one
+# costs hundreds of ms. Random single frames go to the static-image instance;
+# the video-mode instance only serves runs of consecutive frames.
+_pose_local = threading.local()
+_pose_instances = []
+_pose_instances_lock = threading.Lock()
+
+
+def get_pose(complexity=DEFAULT_MODEL_COMPLEXITY, static_image_mode=True):
+    """Return this thread's Pose instance for complexity and mode, creating it on first use."""
+    poses = getattr(_pose_local, 'poses', None)
+    if poses is None:
+        poses = _pose_local.poses = {}
+    key = (complexity, static_image_mode)
+    pose = poses.get(key)
+    if pose is None:
+        pose = mp_pose.Pose(static_image_mode=static_image_mode, model_complexity=complexity,
+                            smooth_landmarks=False)
+        poses[key] = pose
+        with _pose_instances_lock:
+            _pose_instances.append(pose)
+    return pose
+
+
+def get_tracking_pose(complexity=DEFAULT_MODEL_COMPLEXITY):
+    """Return this thread's video-mode Pose with no tracking state from earlier frames.
+
+    reset() re-opens the whole graph, so it is skipped when the instance
+    hasn't tracked anything yet.
+    """
+    pose = get_pose(complexity, static_image_mode=False)
+    tracked = getattr(_pose_local, 'tracked', None)
+    if tracked is None:
+        tracked = _pose_local.tracked = set()
+    if complexity in tracked:
+        pose.reset()
+    tracked.add(complexity)
+    return pose
+
+
+@atexit.register
+def _close_poses():
+    with _pose_instances_lock:
+        for pose in _pose_instances:
+            pose.close()
+        _pose_instances.clear()
+
+
+def encode_image(frame, fmt):
+    """Encode a frame in one of IMAGE_FORMATS and return the bytes."""
+    ext, _, params = IMAGE_FORMATS[fmt]
+    _, buffer = cv2.imencode(ext, frame, params)
+    return buffer.tobytes()
+
+
+def cache_image(data, fmt, *key_parts):
+    """Store encoded image bytes under key_parts and return the URL they are served from."""
+    key = hashlib.sha1(repr((fmt,) + key_parts).encode()).hexdigest()
+    name = f'{key}{IMAGE_FORMATS[fmt][0]}'
+    path = os.path.join(ANNOTATED_FOLDER, name)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    evict_images()
+    return f'/api/image/{name}'
+
+
+def touch_image(image_url):
+    """Mark a cached image as recently used; return False if it was evicted."""
+    path = os.path.join(ANNOTATED_FOLDER, image_url.rsplit('/', 1)[-1])
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def evict_images():
+    """Delete the least recently used annotated images beyond IMAGE_CACHE_SIZE.
+
+    Annotated images live on disk so the follow-up image request can be served
+    by any worker process. Eviction goes by file mtime across the whole folder,
+    so it covers every worker's images (including ones from before a restart)
+    and the images most recently handed out are the last to go.
+    """
+    extensions = tuple(ext for ext, _, _ in IMAGE_FORMATS.values())
+    images = []
+    for dir_entry in os.scandir(ANNOTATED_FOLDER):
+        if not dir_entry.name.endswith(extensions):
+            continue  # Skip other workers' in-progress .tmp files
+        try:
+            images.append((dir_entry.stat().st_mtime, dir_entry.path))
+        except OSError:
+            pass  # Removed by another worker meanwhile
+    images.sort()
+    for _, path in images[:-IMAGE_CACHE_SIZE]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def detect_pose(frame, pose):
+    """Run pose detection on a BGR frame and return its landmarks (or None)."""
+    # The model only sees a 256x256 crop, so shrink large frames first.
+    # Landmarks are normalized, so they still map onto the full-size frame.
+    h, w = frame.shape[:2]
+    if max(h, w) > POSE_INPUT_MAX_SIDE:
+        scale = POSE_INPUT_MAX_SIDE / max(h, w)
+        frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    result = pose.process(to_rgb(frame))
+    return result.pose_landmarks
+
+
+def annotate_frame(frame, pose_landmarks):
+    """Draw the skeleton for detected landmarks and extract pixel keypoints.
+
+    Keypoints come back as [x, y, z, visibility] rows (see keypoints_to_json).
+    """
+    canvas = LazyCanvas(frame)
     h, w, _ = frame.shape
     
-    keypoints = []
-    
-    if result.pose_landmarks:
-        # Draw connections
-        for connection in SIMPLE_CONNECTIONS:
-            start_idx = connection[0].value
-            end_idx = connection[1].value
-            start_point = result.pose_landmarks.landmark[start_idx]
-            end_point = result.pose_landmarks.landmark[end_idx]
-            
-            if start_point.visibility > 0.5 and end_point.visibility > 0.5:
-                start = (int(start_point.x * w), int(start_point.y * h))
-                end = (int(end_point.x * w), int(end_point.y * h))
-                cv2.line(annotated, start, end, (0, 0, 255), 2)
+    if pose_landmarks:
+        arr = landmarks_to_array(pose_landmarks)
+        draw_pose(canvas, arr)
         
-        # Draw landmarks
-        for landmark_idx in KEY_LANDMARKS:
-            lm = result.pose_landmarks.landmark[landmark_idx.value]
-            if lm.visibility > 0.5:
-                x = int(lm.x * w)
-                y = int(lm.y * h)
-                cv2.circle(annotated, (x, y), 3, (0, 255, 0), -1)
+        # Scale every landmark to pixels in one pass (z uses the same scale as x)
+        keypoints = (arr * np.array((w, h, w, 1), dtype=np.float64)).tolist()
         
-        # Extract keypoints
-        for lm in result.pose_landmarks.landmark:
-            keypoints.append({
-                'x': float(lm.x * w),
-                'y': float(lm.y * h),
-                'z': float(lm.z * w),
-                'visibility': float(lm.visibility)
-            })
-        
-        return annotated, keypoints, True
+        return canvas.arr, keypoints, True
     else:
-        return annotated, [], False
+        return canvas.arr, [], False
+
+
+def keypoints_to_json(keypoints):
+    """Label [x, y, z, visibility] rows with KEYPOINT_FIELDS for the JSON response."""
+    return [dict(zip(KEYPOINT_FIELDS, kp)) for kp in keypoints]
+
+
+def analyze_frame(frame, pose):
+    """Analyze a frame and return annotated version with pose overlay."""
+    return annotate_frame(frame, detect_pose(frame, pose))
+
+
+def analyze_frames_pipelined(filepath, mtime, frame_indices, complexity, fmt):
+    """Decode, run pose detection on, and encode frames in three overlapping stages.
+
+    A decoder thread reads frames in ascending order from the cached capture
+    (locking it per frame, so other requests on the video are not held up),
+    the calling thread runs pose detection (so it keeps using its own Pose
+    instances, tracking only across consecutive frames), and an encoder thread draws the overlay, encodes it as fmt and
+    stores it in the image cache. Returns a dict mapping frame index to its
+    result.
+    """
+    decoded = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    detected = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    analyzed = {}
+    errors = []
+    
+    def decode():
+        try:
+            for frame_index in sorted(set(frame_indices)):
+                if stop.is_set():
+                    break
+                ret, frame = read_video_frame(filepath, frame_index)
+                if ret:
+                    decoded.put((frame_index, frame))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            decoded.put(None)
+    
+    def encode():
+        while True:
+            item = detected.get()
+            if item is None:
+                break
+            if errors:
+                continue  # Keep draining so the producer never blocks
+            frame_index, frame, pose_landmarks = item
+            try:
+                annotated_frame, keypoints, has_pose = annotate_frame(frame, pose_landmarks)
+                # Tagged apart from single-frame images, which may use a different Pose
+                image_url = cache_image(encode_image(annotated_frame, fmt), fmt, 'batch',
+                                        filepath, mtime, frame_index, complexity)
+                analyzed[frame_index] = {
+                    'frame_index': frame_index,
+                    'has_pose': has_pose,
+                    'keypoints': keypoints_to_json(keypoints),
+                    'annotated_image_url': image_url
+                }
+            except Exception as e:
+                errors.append(e)
+    
+    wanted = set(frame_indices)
+    decoder = threading.Thread(target=decode, daemon=True)
+    encoder = threading.Thread(target=encode, daemon=True)
+    decoder.start()
+    encoder.start()
+    
+    try:
+        previous_index = None
+        while True:
+            item = decoded.get()
+            if item is None:
+                break
+            frame_index, frame = item
+            # Consecutive frames keep the same Pose; a new run only gets a
+            # tracker if its next frame is wanted too, lone frames go static
+            if previous_index is None or frame_index != previous_index + 1:
+                if frame_index + 1 in wanted:
+                    pose = get_tracking_pose(complexity)
+                else:
+                    pose = get_pose(complexity)
+            previous_index = frame_index
+            detected.put((frame_index, frame, detect_pose(frame, pose)))
+    except BaseException:
+        # Unblock the decoder before bailing out
+        stop.set()
+        while decoded.get() is not None:
+            pass
+        raise
+    finally:
+        detected.put(None)
+        encoder.join()
+        decoder.join()
+    
+    if errors:
+        raise errors[0]
+    return analyzed
+
+
+@functools.lru_cache(maxsize=ANALYZE_CACHE_SIZE)
+def _analyze_cached(filepath, mtime, frame_index, complexity, fmt):
+    """Analyze one frame, memoized so revisiting a frame skips decode and inference.
+
+    mtime is only there to key the cache, so a re-uploaded video misses it.
+    The annotated image is written to the image cache once, on the miss.
+    Returns None if the frame can't be read, otherwise (image_url, keypoints,
+    has_pose) with keypoints as a tuple of (x, y, z, visibility) tuples.
+    """
+    ret, frame = read_video_frame(filepath, frame_index)
+    if not ret:
+        return None
+    
+    # Tracking never helps random access, so use the static-image Pose
+    annotated_frame, keypoints, has_pose = analyze_frame(frame, get_pose(complexity))
+    keypoints = tuple(map(tuple, keypoints))
+    image_url = cache_image(encode_image(annotated_frame, fmt), fmt, 'single',
+                            filepath, mtime, frame_index, complexity)
+    return image_url, keypoints, has_pose
 
 
 @app.route('/')
@@ -168,22 +462,17 @@ def get_frame(filename, frame_index):
     if not os.path.exists(filepath):
         return jsonify({'error': 'Video not found'}), 404
     
-    cap = cv2.VideoCapture(filepath)
-    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
-    ret, frame = cap.read()
-    cap.release()
+    fmt = request.args.get('fmt', 'jpg')
+    if fmt not in IMAGE_FORMATS:
+        return jsonify({'error': 'Unsupported image format'}), 400
+    
+    ret, frame = read_video_frame(filepath, frame_index)
     
     if not ret:
         return jsonify({'error': 'Frame not found'}), 404
     
-    # Encode frame as JPEG
-    _, buffer = cv2.imencode('.jpg', frame)
-    frame_base64 = base64.b64encode(buffer).decode('utf-8')
-    
-    return jsonify({
-        'frame_index': frame_index,
-        'image': f'data:image/jpeg;base64,{frame_base64}'
-    })
+    # Encode frame as JPEG (or ?fmt=webp)
+    return send_file(io.BytesIO(encode_image(frame, fmt)), mimetype=IMAGE_FORMATS[fmt][1])
 
 
 @app.route('/api/video/<filename>/analyze', methods=['POST'])
@@ -196,30 +485,46 @@ def analyze_frame_endpoint(filename):
     if not os.path.exists(filepath):
         return jsonify({'error': 'Video not found'}), 404
     
-    # Read frame
-    cap = cv2.VideoCapture(filepath)
-    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
-    ret, frame = cap.read()
-    cap.release()
+    fmt = request.args.get('fmt', 'jpg')
+    if fmt not in IMAGE_FORMATS:
+        return jsonify({'error': 'Unsupported image format'}), 400
     
-    if not ret:
-        return jsonify({'error': 'Frame not found'}), 404
+    complexity = data.get('complexity', DEFAULT_MODEL_COMPLEXITY)
+    # Exact ints only: True and 1.0 compare equal to 1 but would key caches separately
+    if type(complexity) is not int or complexity not in (0, 1, 2):
+        return jsonify({'error': 'complexity must be 0, 1 or 2'}), 400
     
-    # Analyze frame
-    pose = mp_pose.Pose(static_image_mode=True, model_complexity=2)
-    annotated_frame, keypoints, has_pose = analyze_frame(frame, pose)
-    pose.close()
+    # Analyze frame (cached per video version, frame, model and format)
+    mtime = os.path.getmtime(filepath)
+    analyzed = _analyze_cached(filepath, mtime, frame_index, complexity, fmt)
+    if analyzed is not None and not touch_image(analyzed[0]):
+        # Evicted from disk since it was memoized; redo it without the cache
+        analyzed = _analyze_cached.__wrapped__(filepath, mtime, frame_index, complexity, fmt)
     
-    # Encode annotated frame as JPEG
-    _, buffer = cv2.imencode('.jpg', annotated_frame)
-    frame_base64 = base64.b64encode(buffer).decode('utf-8')
+    if analyzed is None:
+        return jsonify({'error': 'Frame not found'}), 404
     
-    return jsonify({
+    # The image itself is fetched separately
+    image_url, keypoints, has_pose = analyzed
+    
+    response = jsonify({
         'frame_index': frame_index,
         'has_pose': has_pose,
-        'keypoints': keypoints,
-        'annotated_image': f'data:image/jpeg;base64,{frame_base64}'
+        'keypoints': keypoints_to_json(keypoints),
+        'annotated_image_url': image_url
     })
+    response.headers['X-Annotated-Image-Url'] = image_url
+    return response
+
+
+@app.route('/api/image/<name>', methods=['GET'])
+def get_annotated_image(name):
+    """Serve a cached annotated image as raw bytes."""
+    name = secure_filename(name)
+    fmt = name.rsplit('.', 1)[-1]
+    if fmt not in IMAGE_FORMATS:
+        return jsonify({'error': 'Image not found'}), 404
+    return send_from_directory(ANNOTATED_FOLDER, name, mimetype=IMAGE_FORMATS[fmt][1])
 
 
 @app.route('/api/video/<filename>/analyze-batch', methods=['POST'])
@@ -232,34 +537,30 @@ def analyze_batch_frames(filename):
     if not os.path.exists(filepath):
         return jsonify({'error': 'Video not found'}), 404
     
+    fmt = request.args.get('fmt', 'jpg')
+    if fmt not in IMAGE_FORMATS:
+        return jsonify({'error': 'Unsupported image format'}), 400
+    
+    complexity = data.get('complexity', DEFAULT_MODEL_COMPLEXITY)
+    # Exact ints only: True and 1.0 compare equal to 1 but would key caches separately
+    if type(complexity) is not int or complexity not in (0, 1, 2):
+        return jsonify({'error': 'complexity must be 0, 1 or 2'}), 400
+    
     if len(frame_indices) > 50:  # Limit batch size
         return jsonify({'error': 'Too many frames (max 50)'}), 400
     
-    cap = cv2.VideoCapture(filepath)
-    pose = mp_pose.Pose(static_image_mode=True, model_complexity=2)
-    
-    results = []
-    for frame_index in frame_indices:
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
-        ret, frame = cap.read()
-        if ret:
-            annotated_frame, keypoints, has_pose = analyze_frame(frame, pose)
-            _, buffer = cv2.imencode('.jpg', annotated_frame)
-            frame_base64 = base64.b64encode(buffer).decode('utf-8')
-            results.append({
-                'frame_index': frame_index,
-                'has_pose': has_pose,
-                'keypoints': keypoints,
-                'annotated_image': f'data:image/jpeg;base64,{frame_base64}'
-            })
+    # Frames are decoded in ascending order so the decoder only moves forward;
+    # results are handed back in the order they were requested
+    analyzed = analyze_frames_pipelined(filepath, os.path.getmtime(filepath),
+                                        frame_indices, complexity, fmt)
     
-    cap.release()
-    pose.close()
+    results = [analyzed[i] for i in frame_indices if i in analyzed]
     
     return jsonify({'results': results})
 
 
 if __name__ == '__main__':
+    # Development server only; production runs wsgi:app under gunicorn (see Procfile)
     # Use PORT environment variable (Railway sets this automatically)
     # Default to 5000 for local development
     port = int(os.environ.get('PORT', 1200))
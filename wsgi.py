@@ -0,0 +1,13 @@
+"""
+WSGI entry point for running the web app under a production server.
+
+    gunicorn -w $(nproc) -k gthread --threads 4 --preload wsgi:app
+
+--preload imports the app once in the master so workers share the loaded
+MediaPipe/OpenCV modules copy-on-write; each worker thread still builds its
+own Pose instance on first use.
+"""
+
+from web_app_backend import app
+
+__all__ = ['app']